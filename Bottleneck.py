@@ -1,11 +1,17 @@
-// pip install Flask pytz
+# pip install Flask pytz
 
 from flask import Flask, request, jsonify
 import random
 from datetime import datetime
 import pytz
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "updated code"))
+import metrics
 
 app = Flask(__name__)
+metrics.install_flask(app, "bottleneck-mcp")
 
 # Configuration
 DENSITY_THRESHOLD = 4.5  # people per square meter
@@ -57,14 +63,17 @@ def process_crowd_data():
         if not data or 'density' not in data:
             return jsonify({'error': 'Invalid input: density required'}), 400
 
-        # Analyze density
-        density_result = density_analyzer(data)
-        
-        # Predict flow (stub)
-        flow_result = flow_predictor(data)
-        
-        # Detect bottleneck
-        bottleneck_event = bottleneck_detector(density_result, flow_result)
+        trace = metrics.trace_from_headers(request.headers)
+
+        with metrics.timed("inference", trace):
+            # Analyze density
+            density_result = density_analyzer(data)
+
+            # Predict flow (stub)
+            flow_result = flow_predictor(data)
+
+            # Detect bottleneck
+            bottleneck_event = bottleneck_detector(density_result, flow_result)
         
         # Emit event
         result = event_emitter(bottleneck_event)
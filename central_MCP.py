@@ -1,4 +1,4 @@
-//Install these pip install flask requests
+# Install these pip install flask requests
 
 
 from flask import Flask, request, jsonify
@@ -7,8 +7,14 @@ import uuid
 from datetime import datetime
 import pytz
 import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "updated code"))
+import metrics
 
 app = Flask(__name__)
+metrics.install_flask(app, "central-mcp")
 
 # Configuration
 BOTTLENECK_MCP_URL = "http://localhost:5000/process"
@@ -42,23 +48,26 @@ def stub_notification_agent(bottleneck_response, anomaly_response):
         return {"message": f"Public Alert: Temporary congestion near {bottleneck_response.get('location', 'unknown')}."}
     return {"message": "No alerts at this time."}
 
-def route_to_bottleneck_agent(payload):
+def route_to_bottleneck_agent(payload, trace=None):
     """Route payload to Bottleneck MCP Server."""
+    headers = metrics.trace_headers(trace) if trace else None
     try:
-        response = requests.post(BOTTLENECK_MCP_URL, json=payload, timeout=AGENT_TIMEOUT)
+        with metrics.timed("bottleneck_call", trace):
+            response = requests.post(BOTTLENECK_MCP_URL, json=payload, headers=headers, timeout=AGENT_TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
         return {"error": f"Bottleneck MCP failed: {str(e)}"}
 
-def orchestrate_agents(payload):
+def orchestrate_agents(payload, trace=None):
     """Orchestrate calls to agents in sequence."""
     # Step 1: Parallel calls to Bottleneck and Anomaly (Anomaly is stubbed)
-    bottleneck_response = route_to_bottleneck_agent(payload)
+    bottleneck_response = route_to_bottleneck_agent(payload, trace)
     anomaly_response = stub_anomaly_agent(payload)
     
     # Step 2: Summary depends on both
-    summary_response = stub_summary_agent(bottleneck_response, anomaly_response)
+    with metrics.timed("summary", trace):
+        summary_response = stub_summary_agent(bottleneck_response, anomaly_response)
     
     # Step 3: Dispatch and Notification depend on results
     dispatch_response = stub_dispatch_agent(bottleneck_response, anomaly_response)
@@ -72,10 +81,11 @@ def orchestrate_agents(payload):
         "notification": notification_response
     }
 
-def store_response(event_id, original_event, agent_responses):
+def store_response(event_id, original_event, agent_responses, trace_id=None):
     """Store the event and agent responses with timestamp."""
     log_entry = {
         "event_id": event_id,
+        "trace_id": trace_id,
         "event": original_event,
         "agent_responses": agent_responses,
         "timestamp": datetime.now(pytz.UTC).isoformat()
@@ -91,20 +101,24 @@ def process_event():
         if not data:
             return jsonify({"error": "Invalid input: JSON payload required"}), 400
 
-        # Generate event ID and timestamp
+        # Generate event ID, trace and timestamp
         event_id = generate_event_id()
+        trace = metrics.trace_from_headers(request.headers)
         timestamp = datetime.now(pytz.UTC).isoformat()
         
         # Orchestrate agent calls
-        agent_responses = orchestrate_agents(data)
+        with metrics.in_flight("central-mcp"):
+            agent_responses = orchestrate_agents(data, trace)
         
         # Store responses
-        log_entry = store_response(event_id, data, agent_responses)
+        with metrics.timed("db_write", trace):
+            log_entry = store_response(event_id, data, agent_responses, trace[metrics.TRACE_ID_ATTR])
         
         # Prepare response
         response = {
             "status": "processed",
             "event_id": event_id,
+            "trace_id": trace[metrics.TRACE_ID_ATTR],
             "timestamp": timestamp,
             "event": data,
             "agent_responses": agent_responses
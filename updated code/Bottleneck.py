@@ -5,14 +5,17 @@ from google.cloud import storage
 import json
 import logging
 import uuid
-import datetime
 import base64
+import asyncio
+import metrics
+from analysis import analyze_density, bottleneck_status
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 # Initialize FastAPI
 app = FastAPI(title="Bottleneck Agent")
+metrics.install_fastapi(app, "bottleneck")
 
 # Google Cloud configs
 PROJECT_ID = "your-gcp-project-id"
@@ -31,17 +34,6 @@ cred = credentials.Certificate("serviceAccountKey.json")
 initialize_app(cred, {'databaseURL': 'https://your-project.firebaseio.com'})
 db_ref = db.reference("/bottlenecks")
 
-# Placeholder for Vertex AI
-async def analyze_with_vertex_ai(frame: str, zone: str):
-    # TODO: Integrate Vertex AI AutoML Vision or custom model for crowd density estimation
-    # Input: Base64 frame; Output: Density score and confidence
-    return {
-        "zone": zone,
-        "crowd_density": 7.4,  # Mock value
-        "confidence": 0.93,
-        "timestamp": datetime.datetime.utcnow().isoformat() + 'Z'
-    }
-
 # Upload frame to Cloud Storage
 async def upload_to_storage(frame: str, filename: str) -> str:
     blob = bucket.blob(f"bottleneck/{filename}")
@@ -50,28 +42,34 @@ async def upload_to_storage(frame: str, filename: str) -> str:
 
 # Process frame from Pub/Sub
 def callback(message):
-    data = json.loads(message.data.decode('utf-8'))
-    frame, camera_id, location, zone_id = data["frame"], data["camera_id"], data["location"], data["zone_id"]
-    
-    # Analyze frame
-    result = asyncio.run(analyze_with_vertex_ai(frame, zone_id))
-    
-    # Store result in Firebase
-    result.update({
-        "status": "bottleneck" if result["crowd_density"] > 5.0 else "normal",
-        "file_url": asyncio.run(upload_to_storage(frame, f"{uuid.uuid4()}.jpg")),
-        "source": "bottleneck",
-        "camera_id": camera_id,
-        "location": location,
-        "zone_id": zone_id
-    })
-    entry_id = str(uuid.uuid4())
-    db_ref.child(entry_id).set(result)
-    
-    # Publish to Summary Agent
-    summary_topic_path = publisher.topic_path(PROJECT_ID, SUMMARY_TOPIC)
-    publisher.publish(summary_topic_path, json.dumps(result).encode('utf-8'))
-    
+    trace = metrics.trace_from_attributes(message.attributes)
+    with metrics.in_flight("bottleneck"):
+        data = json.loads(message.data.decode('utf-8'))
+        frame, camera_id, location, zone_id = data["frame"], data["camera_id"], data["location"], data["zone_id"]
+
+        # Analyze frame
+        with metrics.timed("inference", trace):
+            result = asyncio.run(analyze_density(frame, zone_id))
+
+        # Store result in Firebase
+        result.update({
+            "status": bottleneck_status(result["crowd_density"]),
+            "file_url": asyncio.run(upload_to_storage(frame, f"{uuid.uuid4()}.jpg")),
+            "source": "bottleneck",
+            "camera_id": camera_id,
+            "location": location,
+            "zone_id": zone_id
+        })
+        entry_id = str(uuid.uuid4())
+        with metrics.timed("db_write", trace):
+            db_ref.child(entry_id).set(result)
+
+        # Publish to Summary Agent
+        summary_topic_path = publisher.topic_path(PROJECT_ID, SUMMARY_TOPIC)
+        with metrics.timed("publish", trace):
+            publisher.publish(summary_topic_path, json.dumps(result).encode('utf-8'), **trace)
+        metrics.EVENTS.inc(outcome=result["status"])
+
     message.ack()
 
 # Start Pub/Sub subscription
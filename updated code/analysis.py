@@ -0,0 +1,36 @@
+import base64
+import datetime
+import cv2
+import numpy as np
+
+# Agent analysis functions, kept free of cloud clients so they can also run offline (replay.py)
+
+BOTTLENECK_DENSITY = 5.0  # people per square meter
+THREAT_KEYWORDS = ['smoke', 'fire', 'weapon', 'gun', 'knife', 'crowd']
+
+# Placeholder for Vertex AI crowd density model
+async def analyze_density(frame: str, zone: str):
+    # TODO: Integrate Vertex AI AutoML Vision or custom model for crowd density estimation
+    # Input: Base64 frame; Output: Density score and confidence
+    return {
+        "zone": zone,
+        "crowd_density": 7.4,  # Mock value
+        "confidence": 0.93,
+        "timestamp": datetime.datetime.utcnow().isoformat() + 'Z'
+    }
+
+# Placeholder for Vertex AI anomaly model
+async def detect_anomalies(frame: str, camera_id: str):
+    # TODO: Integrate Vertex AI Vision API or custom model for anomaly detection
+    # Input: Base64 frame; Output: List of detected labels (e.g., ["smoke", "fire"])
+    img_data = base64.b64decode(frame)
+    img = cv2.imdecode(np.frombuffer(img_data, np.uint8), cv2.IMREAD_COLOR)
+    # Mock labels for skeleton
+    labels = ["smoke"] if np.random.rand() > 0.8 else []
+    return labels
+
+def bottleneck_status(crowd_density: float, threshold: float = BOTTLENECK_DENSITY) -> str:
+    return "bottleneck" if crowd_density > threshold else "normal"
+
+def is_threat(labels: list, keywords: list = THREAT_KEYWORDS) -> bool:
+    return any(keyword in label.lower() for label in labels for keyword in keywords)
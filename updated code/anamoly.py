@@ -6,8 +6,10 @@ import json
 import logging
 import uuid
 import datetime
-import cv2
-import numpy as np
+import base64
+import asyncio
+import metrics
+from analysis import detect_anomalies, is_threat
 from collections import deque
 
 # Setup logging
@@ -15,6 +17,7 @@ logging.basicConfig(level=logging.INFO)
 
 # Initialize FastAPI
 app = FastAPI(title="Anomaly Agent")
+metrics.install_fastapi(app, "anomaly")
 
 # Google Cloud configs
 PROJECT_ID = "your-gcp-project-id"
@@ -36,16 +39,6 @@ db_ref = db.reference("/verified_alerts")
 # Sliding frame buffer
 frame_buffer = deque(maxlen=10)
 
-# Placeholder for Vertex AI
-async def analyze_with_vertex_ai(frame: str, camera_id: str):
-    # TODO: Integrate Vertex AI Vision API or custom model for anomaly detection
-    # Input: Base64 frame; Output: List of detected labels (e.g., ["smoke", "fire"])
-    img_data = base64.b64decode(frame)
-    img = cv2.imdecode(np.frombuffer(img_data, np.uint8), cv2.IMREAD_COLOR)
-    # Mock labels for skeleton
-    labels = ["smoke"] if np.random.rand() > 0.8 else []
-    return labels
-
 # Upload frame to Cloud Storage
 async def upload_to_storage(frame: str, filename: str) -> str:
     blob = bucket.blob(f"anomalies/{filename}")
@@ -54,45 +47,55 @@ async def upload_to_storage(frame: str, filename: str) -> str:
 
 # Process frame from Pub/Sub
 def callback(message):
-    data = json.loads(message.data.decode('utf-8'))
-    frame, camera_id, location, zone_id = data["frame"], data["camera_id"], data["location"], data["zone_id"]
-    
-    # Add to buffer
-    frame_buffer.append(frame)
-    
-    # Analyze frame
-    labels = asyncio.run(analyze_with_vertex_ai(frame, camera_id))
-    threat_keywords = ['smoke', 'fire', 'weapon', 'gun', 'knife', 'crowd']
-    
-    if any(keyword in label.lower() for label in labels for keyword in threat_keywords):
-        # Store alert in Firebase
-        alert = {
-            "image_url": asyncio.run(upload_to_storage(frame, f"{uuid.uuid4()}.jpg")),
-            "message": f"Verified Threat: {labels[0]}",
-            "timestamp": datetime.datetime.utcnow().isoformat(),
-            "camera_id": camera_id,
-            "location": location,
-            "zone_id": zone_id
-        }
-        db_ref.push(alert)
-        
-        # Analyze buffer for additional context
-        for buffered_frame in frame_buffer:
-            buffered_labels = asyncio.run(analyze_with_vertex_ai(buffered_frame, camera_id))
-            if any(keyword in label.lower() for label in buffered_labels for keyword in threat_keywords):
-                db_ref.push({
-                    "image_url": asyncio.run(upload_to_storage(buffered_frame, f"{uuid.uuid4()}.jpg")),
-                    "message": f"Buffered Threat: {buffered_labels[0]}",
-                    "timestamp": datetime.datetime.utcnow().isoformat(),
-                    "camera_id": camera_id,
-                    "location": location,
-                    "zone_id": zone_id
-                })
-        
-        # Publish to Summary Agent
-        summary_topic_path = publisher.topic_path(PROJECT_ID, SUMMARY_TOPIC)
-        publisher.publish(summary_topic_path, json.dumps(alert).encode('utf-8'))
-    
+    trace = metrics.trace_from_attributes(message.attributes)
+    with metrics.in_flight("anomaly"):
+        data = json.loads(message.data.decode('utf-8'))
+        frame, camera_id, location, zone_id = data["frame"], data["camera_id"], data["location"], data["zone_id"]
+
+        # Add to buffer
+        frame_buffer.append(frame)
+
+        # Analyze frame
+        with metrics.timed("inference", trace):
+            labels = asyncio.run(detect_anomalies(frame, camera_id))
+
+        if is_threat(labels):
+            # Store alert in Firebase
+            alert = {
+                "image_url": asyncio.run(upload_to_storage(frame, f"{uuid.uuid4()}.jpg")),
+                "message": f"Verified Threat: {labels[0]}",
+                "timestamp": datetime.datetime.utcnow().isoformat(),
+                "source": "anomaly",
+                "camera_id": camera_id,
+                "location": location,
+                "zone_id": zone_id
+            }
+            with metrics.timed("db_write", trace):
+                db_ref.push(alert)
+
+            # Analyze buffer for additional context
+            for buffered_frame in frame_buffer:
+                with metrics.timed("inference"):
+                    buffered_labels = asyncio.run(detect_anomalies(buffered_frame, camera_id))
+                if is_threat(buffered_labels):
+                    with metrics.timed("db_write"):
+                        db_ref.push({
+                            "image_url": asyncio.run(upload_to_storage(buffered_frame, f"{uuid.uuid4()}.jpg")),
+                            "message": f"Buffered Threat: {buffered_labels[0]}",
+                            "timestamp": datetime.datetime.utcnow().isoformat(),
+                            "camera_id": camera_id,
+                            "location": location,
+                            "zone_id": zone_id
+                        })
+
+            # Publish to Summary Agent
+            summary_topic_path = publisher.topic_path(PROJECT_ID, SUMMARY_TOPIC)
+            with metrics.timed("publish", trace):
+                publisher.publish(summary_topic_path, json.dumps(alert).encode('utf-8'), **trace)
+            metrics.EVENTS.inc(outcome="anomaly")
+        else:
+            metrics.EVENTS.inc(outcome="clear")
+
     message.ack()
 
 # Start Pub/Sub subscription
@@ -2,71 +2,53 @@ import asyncio
 import base64
 import cv2
 import numpy as np
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from google.cloud import pubsub_v1
 from google.cloud import storage
 import json
 import logging
-import ffmpeg
+import time
+import metrics
+from frames import TARGET_FPS, MOTION_THRESHOLD, frame_signals, extract_frames
+from frame_router import FrameScheduler, route_frame, HIGH_LANE, LOW_LANE, ANOMALY_KEYFRAME_SEC
+from stream import CameraStream
+from sampling import SamplingController
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 # Initialize FastAPI
 app = FastAPI(title="Central MCP - Project Drishti")
+metrics.install_fastapi(app, "central")
 
 # Google Cloud configs
 PROJECT_ID = "your-gcp-project-id"  # Replace with your GCP project ID
 BUCKET_NAME = "your-bucket-name"  # Replace with your Cloud Storage bucket
 BOTTLENECK_TOPIC = "bottleneck-frames"
 ANOMALY_TOPIC = "anomaly-frames"
+AGENT_TOPICS = {"bottleneck": BOTTLENECK_TOPIC, "anomaly": ANOMALY_TOPIC}
+FEEDBACK_SUBSCRIPTION = "sampling-feedback-sub"  # subscription on the agents' summary-events topic
 
 # Initialize Google Cloud clients
 publisher = pubsub_v1.PublisherClient()
+subscriber = pubsub_v1.SubscriberClient()
 storage_client = storage.Client()
 bucket = storage_client.bucket(BUCKET_NAME)
 
 # Frame extraction configs
 FRAME_INTERVAL = 5  # seconds
-TARGET_FPS = 1      # 1 frame per second
 
-# Camera metadata
+# Camera metadata; cameras with a stream_url are ingested live from startup
 CAMERA_CONFIG = {
-    "CAM_01": {"location": "Gate 1 - North Wing", "zone_id": "Z1"},
-    "CAM_02": {"location": "Main Stage", "zone_id": "Z2"},
-    "CAM_03": {"location": "South Wing Exit", "zone_id": "Z3"}
+    "CAM_01": {"location": "Gate 1 - North Wing", "zone_id": "Z1", "stream_url": None},
+    "CAM_02": {"location": "Main Stage", "zone_id": "Z2", "stream_url": None},
+    "CAM_03": {"location": "South Wing Exit", "zone_id": "Z3", "stream_url": None}
 }
 
-# Motion heuristic for frame prioritization
-def is_high_motion(prev_frame, curr_frame, threshold=0.1):
-    if prev_frame is None:
-        return False
-    prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
-    curr_gray = cv2.cvtColor(curr_frame, cv2.COLOR_BGR2GRAY)
-    diff = cv2.absdiff(prev_gray, curr_gray)
-    motion_score = np.mean(diff) / 255.0
-    return motion_score > threshold
-
-# Frame extraction with FFmpeg
-def extract_frames(video_path: str, interval_sec: int, fps: int = TARGET_FPS) -> list:
-    try:
-        stream = ffmpeg.input(video_path)
-        stream = stream.filter('fps', fps=fps)
-        out, _ = stream.output('pipe:', format='image2pipe', pix_fmt='rgb24').run(capture_stdout=True)
-        frames = []
-        prev_frame = None
-        for frame_data in out.split(b'\xff\xd8'):  # JPEG delimiter
-            if not frame_data:
-                continue
-            frame = b'\xff\xd8' + frame_data
-            img = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
-            if prev_frame is None or is_high_motion(prev_frame, img):
-                frames.append(base64.b64encode(frame).decode('utf-8'))
-            prev_frame = img
-        return frames
-    except ffmpeg.Error as e:
-        logging.error(f"FFmpeg error: {e}")
-        return []
+# Adaptive sampling: TARGET_FPS is the starting rate, agent results move it per zone
+sampler = SamplingController({camera_id: config["zone_id"] for camera_id, config in CAMERA_CONFIG.items()},
+                             base_fps=TARGET_FPS)
+SAMPLE_RATE = metrics.Gauge("drishti_sample_fps", "Current adaptive extraction rate per camera")
 
 # Upload video to Cloud Storage
 async def upload_to_storage(file: UploadFile, filename: str) -> str:
@@ -74,23 +56,120 @@ async def upload_to_storage(file: UploadFile, filename: str) -> str:
     blob.upload_from_file(file.file, content_type=file.content_type)
     return blob.public_url
 
-# Publish frames to Pub/Sub
-async def publish_frames(frames: list, camera_id: str, location: str, zone_id: str):
-    bottleneck_topic_path = publisher.topic_path(PROJECT_ID, BOTTLENECK_TOPIC)
-    anomaly_topic_path = publisher.topic_path(PROJECT_ID, ANOMALY_TOPIC)
-    batch_size = len(frames)
-    futures = []
-    for i, frame in enumerate(frames):
+# Publish a routed frame to its agent's topic
+async def publish_routed(item):
+    topic_path = publisher.topic_path(PROJECT_ID, AGENT_TOPICS[item.agent])
+    with metrics.in_flight("publish"), metrics.timed("publish", item.attributes):
+        data = json.dumps(item.payload).encode('utf-8')
+        await asyncio.wrap_future(publisher.publish(topic_path, data, **item.attributes))
+
+scheduler = FrameScheduler(publish_routed)
+metrics.QUEUE_DEPTH.set_function(lambda: scheduler.depth(HIGH_LANE), queue="frames_high")
+metrics.QUEUE_DEPTH.set_function(lambda: scheduler.depth(LOW_LANE), queue="frames_low")
+
+@app.on_event("startup")
+async def start_scheduler():
+    scheduler.start()
+
+# Route frames to the agents that need them and queue them by priority
+async def publish_frames(frames: list, camera_id: str, location: str, zone_id: str, trace: dict = None):
+    queued = 0
+    for frame in frames:
         payload = {
-            "frame": frame,
+            "frame": frame["frame"],
             "camera_id": camera_id,
             "location": location,
             "zone_id": zone_id
         }
-        topic = anomaly_topic_path if i >= batch_size // 2 else bottleneck_topic_path  # Prioritize anomaly for later frames
-        futures.append(publisher.publish(topic, json.dumps(payload).encode('utf-8')))
-    await asyncio.gather(*futures)
-    logging.info(f"Published {len(frames)} frames to Pub/Sub")
+        for item in route_frame(payload, frame["motion"], frame["density"], frame.get("keyframe", False), trace):
+            queued += await scheduler.submit(item)
+    logging.info(f"Queued {queued} routed frames from {len(frames)} extracted frames")
+
+# Live stream sessions, keyed by camera_id
+streams = {}
+
+# Motion-filter and route frames from a live stream, keeping per-camera state between frames
+def make_stream_handler(camera_id: str, location: str, zone_id: str):
+    state = {"prev_frame": None, "last_anomaly": None}
+
+    def analyze(jpeg: bytes):
+        with metrics.timed("decode"):
+            img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            return None
+        with metrics.timed("motion_filter"):
+            signals = frame_signals(state["prev_frame"], img)
+        moved = state["prev_frame"] is None or signals[0] > MOTION_THRESHOLD
+        state["prev_frame"] = img
+        return signals, moved
+
+    async def handle(jpeg: bytes):
+        trace = metrics.new_trace()
+        result = await asyncio.to_thread(analyze, jpeg)
+        if result is None:
+            return
+        signals, moved = result
+        # Static scenes still reach the anomaly agent every ANOMALY_KEYFRAME_SEC of wall time
+        now = time.monotonic()
+        keyframe = state["last_anomaly"] is None or now - state["last_anomaly"] >= ANOMALY_KEYFRAME_SEC
+        if not moved and not keyframe:
+            return
+        payload = {
+            "frame": base64.b64encode(jpeg).decode('utf-8'),
+            "camera_id": camera_id,
+            "location": location,
+            "zone_id": zone_id
+        }
+        for item in route_frame(payload, signals[0], signals[1], keyframe, trace):
+            if item.agent == "anomaly":
+                state["last_anomaly"] = now
+            await scheduler.submit(item)
+
+    return handle
+
+def start_stream(camera_id: str, url: str, realtime: bool = False) -> CameraStream:
+    config = CAMERA_CONFIG.get(camera_id, {})
+    handler = make_stream_handler(camera_id, config.get("location"), config.get("zone_id"))
+    sampler.activate(camera_id, config.get("zone_id"), ttl=None)
+    session = CameraStream(camera_id, url, sampler.max_fps, handler, realtime=realtime,
+                           rate=lambda: sampler.rate_for(camera_id))
+    streams[camera_id] = session
+    metrics.QUEUE_DEPTH.set_function(lambda: session.status()["queue_depth"], queue=f"stream_{camera_id}")
+    session.start()
+    return session
+
+async def stop_stream(camera_id: str) -> CameraStream:
+    session = streams.pop(camera_id)
+    await session.stop()
+    sampler.deactivate(camera_id)
+    metrics.QUEUE_DEPTH.remove(queue=f"stream_{camera_id}")
+    return session
+
+# Agent results feed the sampling controller by zone_id
+def sampling_feedback(message):
+    result = json.loads(message.data.decode('utf-8'))
+    zone_id = result.get("zone_id")
+    if zone_id:
+        sampler.report(zone_id, density=result.get("crowd_density"), anomaly=result.get("source") == "anomaly")
+    message.ack()
+
+@app.on_event("startup")
+async def start_sampling_feedback():
+    for camera_id in CAMERA_CONFIG:
+        SAMPLE_RATE.set_function(lambda camera_id=camera_id: sampler.rate_for(camera_id), camera_id=camera_id)
+    subscription_path = subscriber.subscription_path(PROJECT_ID, FEEDBACK_SUBSCRIPTION)
+    subscriber.subscribe(subscription_path, callback=sampling_feedback)
+    logging.info("Central MCP subscribed to agent results for adaptive sampling")
+
+@app.on_event("startup")
+async def start_configured_streams():
+    for camera_id, config in CAMERA_CONFIG.items():
+        if config.get("stream_url"):
+            start_stream(camera_id, config["stream_url"])
+
+@app.on_event("shutdown")
+async def stop_streams():
+    await asyncio.gather(*(stop_stream(camera_id) for camera_id in list(streams)))
 
 # Main ingest route
 @app.post("/ingest")
@@ -100,28 +179,60 @@ async def ingest_video(
     location: str = Form(None),
     zone_id: str = Form(None)
 ):
+    trace = metrics.new_trace()
+
     # Autofill metadata
     if camera_id in CAMERA_CONFIG:
         location = location or CAMERA_CONFIG[camera_id]["location"]
         zone_id = zone_id or CAMERA_CONFIG[camera_id]["zone_id"]
+    # The upload shares the frame budget with the live streams for a while
+    sampler.activate(camera_id, zone_id)
 
     # Save video to Cloud Storage
     video_url = await upload_to_storage(file, file.filename)
 
     # Extract frames
-    frames = extract_frames(file.filename, FRAME_INTERVAL)
+    # Off the event loop, so live streams and publish workers keep running during the decode
+    frames = await asyncio.to_thread(extract_frames, file.filename, FRAME_INTERVAL,
+                                     fps=sampler.rate_for(camera_id), trace=trace,
+                                     keyframe_sec=ANOMALY_KEYFRAME_SEC)
 
     # Publish frames to Pub/Sub
-    await publish_frames(frames, camera_id, location, zone_id)
+    await publish_frames(frames, camera_id, location, zone_id, trace)
 
     return {
         "status": "Frames dispatched",
         "camera_id": camera_id,
         "location": location,
         "zone_id": zone_id,
-        "video_url": video_url
+        "video_url": video_url,
+        "trace_id": trace[metrics.TRACE_ID_ATTR]
     }
 
+@app.post("/streams/{camera_id}/start")
+async def start_stream_route(camera_id: str, url: str = Form(None), realtime: bool = Form(False)):
+    url = url or CAMERA_CONFIG.get(camera_id, {}).get("stream_url")
+    if not url:
+        raise HTTPException(status_code=400, detail=f"No stream_url configured for {camera_id}")
+    if camera_id in streams:
+        await stop_stream(camera_id)
+    return start_stream(camera_id, url, realtime).status()
+
+@app.post("/streams/{camera_id}/stop")
+async def stop_stream_route(camera_id: str):
+    if camera_id not in streams:
+        raise HTTPException(status_code=404, detail=f"No stream running for {camera_id}")
+    session = await stop_stream(camera_id)
+    return session.status()
+
+@app.get("/streams")
+async def list_streams():
+    return [session.status() for session in streams.values()]
+
+@app.get("/sampling")
+async def sampling_rates():
+    return sampler.rates()
+
 @app.get("/health")
 async def health():
     return {"status": "central mcp alive"}
\ No newline at end of file
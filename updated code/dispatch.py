@@ -6,6 +6,8 @@ from datetime import datetime
 import firebase_admin
 from firebase_admin import credentials, db, messaging
 from google.cloud import pubsub_v1
+import metrics
+from incidents import IncidentIndex
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -25,6 +27,7 @@ subscriber = pubsub_v1.SubscriberClient()
 subscription_path = subscriber.subscription_path(project_id, subscription_name)
 
 app = FastAPI(title="Drishti Dispatch Agent")
+metrics.install_fastapi(app, "dispatch")
 
 # Data models (reused from provided code)
 class CriticalEvent(BaseModel):
@@ -33,6 +36,7 @@ class CriticalEvent(BaseModel):
     severity: str  # e.g., high
     location: str
     timestamp: str
+    zone_id: str | None = None
 
 class FieldUnit(BaseModel):
     unitId: str
@@ -48,23 +52,33 @@ class DispatchInstruction(BaseModel):
     timestamp: str
     eta: float | None = None
 
+# Correlates events from all cameras and agents into incidents
+incident_index = IncidentIndex()
+
 # Simplified action mapper
 def action_mapper(event: CriticalEvent) -> str:
     action_map = {
-        "fire": {"high": "Deploy firefighter"},
-        "medical": {"high": "Deploy medic"},
+        "fire": {"high": "Deploy firefighter", "critical": "Deploy firefighter"},
+        "medical": {"high": "Deploy medic", "critical": "Deploy medic"},
     }
     return action_map.get(event.type, {}).get(event.severity, "Notify supervisor")
 
+# Unit type an action needs; supervisor notifications reserve no field units
+def required_unit_type(action: str) -> str | None:
+    if "firefighter" in action:
+        return "firefighter"
+    if "medic" in action:
+        return "medic"
+    return None
+
 # Simplified unit locator
-def unit_locator(event: CriticalEvent, action: str) -> List[FieldUnit]:
+def unit_locator(event: CriticalEvent, required_type: str) -> List[FieldUnit]:
     units_data = db_ref.child("field_units").get() or {}
     available_units = [
         FieldUnit(**unit_data, unitId=unit_id)
         for unit_id, unit_data in units_data.items()
         if unit_data.get("status") == "available"
     ]
-    required_type = "firefighter" if "firefighter" in action else "medic"
     units = [unit for unit in available_units if unit.type == required_type][:1]
     if not units:
         logger.warning(f"No available units for event: {event.eventId}")
@@ -73,8 +87,13 @@ def unit_locator(event: CriticalEvent, action: str) -> List[FieldUnit]:
         db_ref.child(f"field_units/{unit.unitId}").update({"status": "busy"})
     return units
 
+# Undo a reservation whose dispatch failed
+def release_units(units: List[FieldUnit]):
+    for unit in units:
+        db_ref.child(f"field_units/{unit.unitId}").update({"status": "available"})
+
 # Dispatch sender
-def dispatch_sender(event: CriticalEvent, action: str, units: List[FieldUnit]) -> DispatchInstruction:
+def dispatch_sender(event: CriticalEvent, action: str, units: List[FieldUnit], trace: dict = None) -> DispatchInstruction:
     instruction = DispatchInstruction(
         eventId=event.eventId,
         action=action,
@@ -82,7 +101,8 @@ def dispatch_sender(event: CriticalEvent, action: str, units: List[FieldUnit]) -
         timestamp=datetime.utcnow().isoformat(),
         eta=5.0  # Mock ETA for demo
     )
-    db_ref.child(f"dispatch_instructions/{event.eventId}").set(instruction.dict())
+    with metrics.timed("db_write", trace):
+        db_ref.child(f"dispatch_instructions/{event.eventId}").set(instruction.dict())
     for unit in units:
         if unit.fcm_token:
             message = messaging.Message(
@@ -93,7 +113,8 @@ def dispatch_sender(event: CriticalEvent, action: str, units: List[FieldUnit]) -
                 token=unit.fcm_token
             )
             try:
-                messaging.send(message)
+                with metrics.timed("fcm_send", trace):
+                    messaging.send(message)
                 logger.info(f"FCM notification sent to unit: {unit.unitId}")
             except Exception as e:
                 logger.error(f"Failed to send FCM to unit {unit.unitId}: {str(e)}")
@@ -102,16 +123,45 @@ def dispatch_sender(event: CriticalEvent, action: str, units: List[FieldUnit]) -
 
 # Pub/Sub callback
 def callback(message):
+    trace = metrics.trace_from_attributes(message.attributes)
     try:
-        event_data = message.data.decode("utf-8")
-        event = CriticalEvent.parse_raw(event_data)
-        logger.info(f"Received event: {event.eventId}")
-        action = action_mapper(event)
-        units = unit_locator(event, action)
-        instruction = dispatch_sender(event, action, units)
+        with metrics.in_flight("dispatch"):
+            event_data = message.data.decode("utf-8")
+            event = CriticalEvent.parse_raw(event_data)
+            logger.info(f"Received event: {event.eventId} (trace {trace[metrics.TRACE_ID_ATTR]})")
+            incident, needs_dispatch = incident_index.observe(
+                event.zone_id or event.location, event.type, event.severity, event.timestamp)
+            if not needs_dispatch:
+                logger.info(f"Event {event.eventId} merged into incident {incident.incident_id}")
+                metrics.EVENTS.inc(outcome="merged")
+                message.ack()
+                return
+            # Dispatch under the incident's stable ID so escalations update the same instruction
+            incident_event = event.copy(update={"eventId": incident.incident_id, "severity": incident.severity})
+            units = []
+            try:
+                action = action_mapper(incident_event)
+                # An escalation must never downgrade the response already dispatched
+                if incident.action and action == "Notify supervisor":
+                    action = incident.action
+                # Reserve only when the incident needs a unit type it does not have yet
+                required_type = required_unit_type(action)
+                if required_type and required_type not in {unit.type for unit in incident.units}:
+                    with metrics.timed("unit_locate", trace):
+                        units = unit_locator(incident_event, required_type)
+                # The instruction lists every unit assigned to the incident so far
+                instruction = dispatch_sender(incident_event, action, incident.units + units, trace)
+            except Exception:
+                release_units(units)
+                incident_index.release(incident)
+                raise
+            incident.action = action
+            incident.units.extend(units)
+        metrics.EVENTS.inc(outcome="dispatched")
         message.ack()
     except Exception as e:
         logger.error(f"Error processing message: {str(e)}")
+        metrics.EVENTS.inc(outcome="failed")
         message.nack()
 
 # Start Pub/Sub subscription
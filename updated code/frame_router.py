@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+
+# Lane names
+HIGH_LANE = "high"
+LOW_LANE = "low"
+
+# Routing configs
+ANOMALY_MOTION_THRESHOLD = 0.15   # mean abs frame diff (0-1) that sends a frame to the anomaly agent
+ANOMALY_KEYFRAME_SEC = 10.0       # each camera sends the anomaly agent a frame at least this often,
+                                  # moving or not (static smoke, fire); chosen before the motion filter
+
+# Scheduling configs
+HIGH_LANE_SIZE = 200   # anomaly frames are never shed; producers wait when this lane is full
+LOW_LANE_SIZE = 500    # density frames are shed lowest-score first when this lane is full
+PUBLISH_WORKERS = 8    # concurrent in-flight publishes
+
+@dataclass
+class RoutedFrame:
+    agent: str
+    lane: str
+    score: float
+    payload: dict
+    attributes: dict = field(default_factory=dict)
+
+# Score a frame for each agent using the signals computed at extraction
+def route_frame(payload: dict, motion: float, density: float, keyframe: bool = False, attributes: dict = None) -> list:
+    attributes = attributes or {}
+    routes = [RoutedFrame("bottleneck", LOW_LANE, density, payload, attributes)]
+    if motion >= ANOMALY_MOTION_THRESHOLD or keyframe:
+        routes.append(RoutedFrame("anomaly", HIGH_LANE, motion, payload, attributes))
+    return routes
+
+# Two-lane scheduler: the high lane is always drained first and applies backpressure,
+# the low lane is bounded and sheds its lowest-scoring frames under pressure
+class FrameScheduler:
+    def __init__(self, publish, high_size: int = HIGH_LANE_SIZE, low_size: int = LOW_LANE_SIZE,
+                 workers: int = PUBLISH_WORKERS):
+        self._publish = publish  # async callable(RoutedFrame)
+        self._sizes = {HIGH_LANE: high_size, LOW_LANE: low_size}
+        self._lanes = {HIGH_LANE: deque(), LOW_LANE: deque()}
+        self._workers = workers
+        self._tasks = []
+        self._cond = None
+        self.published = {HIGH_LANE: 0, LOW_LANE: 0}
+        self.shed = {HIGH_LANE: 0, LOW_LANE: 0}
+
+    def depth(self, lane: str) -> int:
+        return len(self._lanes[lane])
+
+    def start(self):
+        self._cond = asyncio.Condition()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        logging.info(f"Frame scheduler started with {self._workers} publish workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, item: RoutedFrame) -> bool:
+        async with self._cond:
+            lane = self._lanes[item.lane]
+            if item.lane == HIGH_LANE:
+                await self._cond.wait_for(lambda: len(lane) < self._sizes[HIGH_LANE])
+            elif len(lane) >= self._sizes[LOW_LANE]:
+                victim = min(lane, key=lambda queued: queued.score)
+                self.shed[LOW_LANE] += 1
+                if victim.score >= item.score:
+                    return False
+                lane.remove(victim)
+            lane.append(item)
+            self._cond.notify_all()
+            return True
+
+    async def _next(self) -> RoutedFrame:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._lanes[HIGH_LANE] or self._lanes[LOW_LANE])
+            lane = self._lanes[HIGH_LANE] or self._lanes[LOW_LANE]
+            item = lane.popleft()
+            self._cond.notify_all()
+            return item
+
+    async def _worker(self):
+        while True:
+            item = await self._next()
+            try:
+                await self._publish(item)
+                self.published[item.lane] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to publish {item.agent} frame: {e}")
@@ -0,0 +1,105 @@
+import base64
+import cv2
+import numpy as np
+import logging
+import ffmpeg
+import metrics
+
+# Frame extraction configs
+TARGET_FPS = 1      # 1 frame per second
+MOTION_THRESHOLD = 0.1
+
+# Motion and crowd-density signals for frame prioritization
+def frame_signals(prev_frame, curr_frame):
+    curr_gray = cv2.cvtColor(curr_frame, cv2.COLOR_BGR2GRAY)
+    # Edge density is a cheap proxy for how packed the scene is
+    density = np.count_nonzero(cv2.Canny(curr_gray, 100, 200)) / curr_gray.size
+    if prev_frame is None:
+        return 0.0, float(density)
+    prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
+    diff = cv2.absdiff(prev_gray, curr_gray)
+    motion_score = np.mean(diff) / 255.0
+    return float(motion_score), float(density)
+
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+READ_CHUNK_SIZE = 64 * 1024
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+# Split complete JPEG images off the front of an MJPEG byte buffer
+def split_jpegs(buffer: bytearray) -> list:
+    images = []
+    while True:
+        start = buffer.find(JPEG_START)
+        if start < 0:
+            buffer.clear()
+            return images
+        end = buffer.find(JPEG_END, start + 2)
+        if end < 0:
+            del buffer[:start]
+            if len(buffer) > MAX_FRAME_BYTES:
+                buffer.clear()
+            return images
+        images.append(bytes(buffer[start:end + 2]))
+        del buffer[:end + 2]
+
+# Stream motion-filtered frames from a file (or a time segment of it) without holding the
+# whole decode in memory. offset_sec is the frame's position in the recording. With
+# keyframe_sec, a frame is also let through every keyframe_sec of footage even without
+# motion, flagged "keyframe".
+def iter_frames(video_path: str, fps: float = TARGET_FPS, motion_threshold: float = MOTION_THRESHOLD,
+                start_sec: float = 0.0, duration_sec: float = None, keyframe_sec: float = None):
+    input_args = {"ss": start_sec} if start_sec else {}
+    if duration_sec:
+        input_args["t"] = duration_sec
+    stream = ffmpeg.input(video_path, **input_args).filter('fps', fps=fps)
+    stream = stream.output('pipe:', format='image2pipe', vcodec='mjpeg').global_args('-loglevel', 'error')
+    process = stream.run_async(pipe_stdout=True)
+    try:
+        buffer = bytearray()
+        prev_frame = None
+        last_keyframe = None
+        seq = 0
+        while True:
+            chunk = process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer.extend(chunk)
+            for frame in split_jpegs(buffer):
+                offset_sec = start_sec + seq / fps
+                seq += 1
+                with metrics.timed("decode"):
+                    img = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    continue
+                with metrics.timed("motion_filter"):
+                    motion, density = frame_signals(prev_frame, img)
+                keyframe = keyframe_sec is not None and \
+                    (last_keyframe is None or offset_sec - last_keyframe >= keyframe_sec - 1e-6)
+                if keyframe:
+                    last_keyframe = offset_sec
+                if prev_frame is None or motion > motion_threshold or keyframe:
+                    yield {
+                        "frame": base64.b64encode(frame).decode('utf-8'),
+                        "motion": motion,
+                        "density": density,
+                        "offset_sec": offset_sec,
+                        "keyframe": keyframe
+                    }
+                prev_frame = img
+        if process.wait() != 0:
+            raise ffmpeg.Error('ffmpeg', None, None)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+# Frame extraction with FFmpeg
+def extract_frames(video_path: str, interval_sec: int, fps: int = TARGET_FPS, trace: dict = None,
+                   motion_threshold: float = MOTION_THRESHOLD, keyframe_sec: float = None) -> list:
+    try:
+        with metrics.timed("extract", trace):
+            return list(iter_frames(video_path, fps, motion_threshold, keyframe_sec=keyframe_sec))
+    except ffmpeg.Error as e:
+        logging.error(f"FFmpeg error: {e}")
+        return []
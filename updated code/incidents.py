@@ -0,0 +1,147 @@
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+# Correlation configs
+BUCKET_SEC = 30            # granularity of the time buckets used for expiry
+INCIDENT_TTL_SEC = 300     # an incident with no new events for this long is closed
+MAX_INCIDENTS = 10000      # hard cap on open incidents kept in memory
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+@dataclass
+class Incident:
+    incident_id: str
+    zone: str
+    type: str
+    severity: str
+    first_seen: float
+    last_seen: float
+    bucket: int = None
+    event_count: int = 0
+    dispatched_severity: str = None
+    claimed_from: str = None
+    action: str = None  # last action dispatched for this incident
+    units: list = field(default_factory=list)  # field units assigned so far
+
+# Naive ISO strings are UTC: the agents stamp events with datetime.utcnow().isoformat()
+def parse_timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return time.time()
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+# In-memory index of open incidents. Each (zone, type) points at its latest open incident;
+# an event merges into it while it is within the TTL of the incident's last event, so one
+# long-running fire stays one incident. Incidents are also filed under the time bucket of
+# their last event, which lets expiry drop whole buckets at once.
+# observe() reports whether the incident needs dispatching, i.e. it is new or its severity
+# rose above what was last dispatched; release() undoes that claim if dispatch fails.
+class IncidentIndex:
+    def __init__(self, bucket_sec: int = BUCKET_SEC, ttl_sec: int = INCIDENT_TTL_SEC,
+                 max_incidents: int = MAX_INCIDENTS):
+        self.bucket_sec = bucket_sec
+        self.ttl_sec = ttl_sec
+        self.max_incidents = max_incidents
+        self._open = {}     # (zone, type) -> latest Incident
+        self._buckets = {}  # bucket of last event -> {incident_id: Incident}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def _file(self, incident: Incident, bucket: int):
+        if self._buckets.get(incident.bucket, {}).pop(incident.incident_id, None) is not None:
+            self._count -= 1
+            if not self._buckets[incident.bucket]:
+                del self._buckets[incident.bucket]
+        incident.bucket = bucket
+        self._buckets.setdefault(bucket, {})[incident.incident_id] = incident
+        self._count += 1
+
+    def _drop_bucket(self, bucket: int, limit: int = None):
+        incidents = self._buckets[bucket]
+        for incident_id in list(incidents)[:limit]:
+            incident = incidents.pop(incident_id)
+            self._count -= 1
+            key = (incident.zone, incident.type)
+            if self._open.get(key) is incident:
+                del self._open[key]
+        if not incidents:
+            del self._buckets[bucket]
+
+    def _evict(self, now: float):
+        horizon = int((now - self.ttl_sec) // self.bucket_sec)
+        # A handful of buckets are live at any time (ttl / bucket_sec), so min() is cheap
+        while self._buckets:
+            oldest = min(self._buckets)
+            if oldest < horizon:
+                self._drop_bucket(oldest)
+            elif self._count > self.max_incidents:
+                self._drop_bucket(oldest, self._count - self.max_incidents)
+            else:
+                break
+
+    def observe(self, zone: str, event_type: str, severity: str, timestamp=None):
+        now = time.time()
+        # Never trust a future event time: it would move the expiry horizon past every open incident
+        ts = min(parse_timestamp(timestamp), now) if timestamp is not None else now
+        with self._lock:
+            incident = self._open.get((zone, event_type))
+            if incident is None or ts - incident.last_seen > self.ttl_sec:
+                incident = Incident(f"INC-{uuid.uuid4().hex[:8]}", zone, event_type, severity, ts, ts)
+                self._open[(zone, event_type)] = incident
+            elif SEVERITY_RANK.get(severity, 0) > SEVERITY_RANK.get(incident.severity, 0):
+                incident.severity = severity
+            incident.event_count += 1
+            incident.last_seen = max(incident.last_seen, ts)
+            last_bucket = int(incident.last_seen // self.bucket_sec)
+            if last_bucket != incident.bucket:
+                self._file(incident, last_bucket)
+            self._evict(incident.last_seen)
+
+            dispatched = incident.dispatched_severity
+            needs_dispatch = dispatched is None or \
+                SEVERITY_RANK.get(incident.severity, 0) > SEVERITY_RANK.get(dispatched, 0)
+            if needs_dispatch:
+                incident.claimed_from = dispatched
+                incident.dispatched_severity = incident.severity
+            return incident, needs_dispatch
+
+    def release(self, incident: Incident):
+        with self._lock:
+            incident.dispatched_severity = incident.claimed_from
+
+# Benchmark: python incidents.py [events] [zones]
+if __name__ == "__main__":
+    import random
+    import sys
+
+    n_events = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_zones = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(42)
+    severities = list(SEVERITY_RANK)
+    events = [(f"Z{rng.randrange(n_zones)}", rng.choice(["fire", "medical", "bottleneck"]),
+               rng.choice(severities)) for _ in range(100_000)]
+
+    index = IncidentIndex()
+    clock = 1_700_000_000.0
+    forwarded = 0
+    start = time.perf_counter()
+    for i in range(n_events):
+        zone, event_type, severity = events[i % len(events)]
+        clock += 0.01  # 100 events per simulated second
+        _, needs_dispatch = index.observe(zone, event_type, severity, clock)
+        forwarded += needs_dispatch
+    elapsed = time.perf_counter() - start
+    print(f"{n_events} events in {elapsed:.2f}s ({n_events / elapsed:,.0f} events/sec)")
+    print(f"forwarded to dispatch: {forwarded} ({forwarded / n_events:.2%}), open incidents: {len(index)}, "
+          f"live buckets: {len(index._buckets)}")
@@ -0,0 +1,190 @@
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Shared instrumentation for the Drishti agents: stage timers, gauges, a Prometheus-text
+# /metrics endpoint and trace IDs carried through Pub/Sub message attributes.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TRACE_ID_ATTR = "trace_id"
+TRACE_START_ATTR = "trace_start"
+TRACE_HEADER = "X-Trace-Id"
+TRACE_START_HEADER = "X-Trace-Start"
+
+SERVICE = "unknown"
+_registry = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_text(labels: tuple) -> str:
+    pairs = [("service", SERVICE)] + list(labels)
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._functions = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    # Read the value lazily at scrape time (e.g. a queue's current length)
+    def set_function(self, fn, **labels):
+        with self._lock:
+            self._functions[tuple(sorted(labels.items()))] = fn
+
+    # Stop reporting a label set, e.g. when the queue it tracks goes away
+    def remove(self, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values.pop(key, None)
+            self._functions.pop(key, None)
+
+    def samples(self):
+        samples = super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        return samples + [(self.name, key, fn()) for key, fn in functions]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = buckets
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(entry)) for key, entry in self._values.items()]
+        samples = []
+        for key, entry in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (("le", bound),), cumulative))
+            samples.append((f"{self.name}_bucket", key + (("le", "+Inf"),), entry[-1]))
+            samples.append((f"{self.name}_sum", key, entry[-2]))
+            samples.append((f"{self.name}_count", key, entry[-1]))
+        return samples
+
+STAGE_SECONDS = Histogram("drishti_stage_seconds", "Time spent in each pipeline stage")
+TRACE_OFFSET_SECONDS = Histogram("drishti_trace_offset_seconds",
+                                 "Time from trace start to the end of each stage")
+QUEUE_DEPTH = Gauge("drishti_queue_depth", "Items waiting in a queue")
+IN_FLIGHT = Gauge("drishti_in_flight", "Messages currently being processed")
+EVENTS = Counter("drishti_events_total", "Events handled, by outcome")
+
+# Time a stage; when a trace is given also record how far into the trace the stage ended
+@contextmanager
+def timed(stage: str, trace: dict = None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if trace and trace.get(TRACE_START_ATTR):
+            offset = time.time() - float(trace[TRACE_START_ATTR])
+            TRACE_OFFSET_SECONDS.observe(offset, stage=stage)
+            logging.debug(f"trace={trace[TRACE_ID_ATTR]} stage={stage} took={elapsed:.4f}s offset={offset:.4f}s")
+
+@contextmanager
+def in_flight(name: str):
+    IN_FLIGHT.inc(name=name)
+    try:
+        yield
+    finally:
+        IN_FLIGHT.dec(name=name)
+
+# Trace context, carried as Pub/Sub message attributes (string values only)
+def new_trace() -> dict:
+    return {TRACE_ID_ATTR: uuid.uuid4().hex, TRACE_START_ATTR: repr(time.time())}
+
+def trace_from_attributes(attributes) -> dict:
+    attributes = attributes or {}
+    if TRACE_ID_ATTR not in attributes:
+        return new_trace()
+    return {TRACE_ID_ATTR: attributes[TRACE_ID_ATTR],
+            TRACE_START_ATTR: attributes.get(TRACE_START_ATTR, repr(time.time()))}
+
+def trace_from_headers(headers) -> dict:
+    if not headers.get(TRACE_HEADER):
+        return new_trace()
+    return {TRACE_ID_ATTR: headers[TRACE_HEADER],
+            TRACE_START_ATTR: headers.get(TRACE_START_HEADER) or repr(time.time())}
+
+def trace_headers(trace: dict) -> dict:
+    return {TRACE_HEADER: trace[TRACE_ID_ATTR], TRACE_START_HEADER: trace[TRACE_START_ATTR]}
+
+# Prometheus text exposition format
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def install_fastapi(app, service: str):
+    from fastapi import Response
+    global SERVICE
+    SERVICE = service
+
+    @app.get("/metrics")
+    async def metrics():
+        return Response(content=render(), media_type=CONTENT_TYPE)
+
+def install_flask(app, service: str):
+    from flask import Response
+    global SERVICE
+    SERVICE = service
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
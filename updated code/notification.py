@@ -8,12 +8,14 @@ from firebase_admin import messaging, initialize_app, credentials
 import logging
 import os
 import asyncio
+import metrics
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 # Initialize FastAPI
 app = FastAPI(title="Notification Agent")
+metrics.install_fastapi(app, "notification")
 
 # Initialize Firebase for FCM
 cred = credentials.Certificate("serviceAccountKey.json")
@@ -42,9 +44,10 @@ async def send_email_alert(subject: str, message: str, location: str, recipients
     full_message = f"📍 **Location**: {location}\n\n{message}"
     msg.attach(MIMEText(full_message, "plain"))
     
-    async with aiosmtplib.SMTP(hostname=SMTP_SERVER, port=SMTP_PORT, use_tls=True) as server:
-        await server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        await server.send_message(msg)
+    with metrics.timed("smtp_send"):
+        async with aiosmtplib.SMTP(hostname=SMTP_SERVER, port=SMTP_PORT, use_tls=True) as server:
+            await server.login(SENDER_EMAIL, SENDER_PASSWORD)
+            await server.send_message(msg)
 
 # Send FCM push notification
 async def send_fcm_alert(subject: str, message: str, location: str):
@@ -55,7 +58,8 @@ async def send_fcm_alert(subject: str, message: str, location: str):
         ),
         topic="security_alerts"  # TODO: Configure FCM topic or device tokens
     )
-    messaging.send(msg)
+    with metrics.timed("fcm_send"):
+        messaging.send(msg)
 
 # Notify endpoint
 @app.post("/notify")
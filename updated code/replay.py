@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+import ffmpeg
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from frames import TARGET_FPS, MOTION_THRESHOLD, iter_frames
+from analysis import BOTTLENECK_DENSITY, analyze_density, detect_anomalies, bottleneck_status, is_threat
+
+# Offline replay/backfill of recorded footage: runs extraction, the motion filter and the
+# agent analysis functions over a directory of recordings in a process pool, writing
+# results to local JSONL instead of Firebase.
+#
+#   python replay.py /recordings/2026-10-18 --out replay-2026-10-18 --motion-threshold 0.08
+#
+# Recordings are grouped by camera using their parent directory name (or the file name
+# for flat directories) and replayed in --segment-sec chunks, streamed from ffmpeg so a
+# worker never holds more than one frame. Re-running with the same --out skips segments
+# already done, drops rows left behind by segments that never reached the checkpoint, and
+# refuses to resume with different analysis parameters. Exits non-zero if any segment failed.
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".ts", ".flv")
+RESULTS_FILE = "results.jsonl"
+CHECKPOINT_FILE = "checkpoint.jsonl"
+PARAMS_FILE = "run.json"
+SEGMENT_SEC = 600  # 10 minute segments per task
+
+def find_recordings(root: str) -> list:
+    recordings = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(VIDEO_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                camera_id = os.path.basename(dirpath) if dirpath != root else os.path.splitext(filename)[0]
+                recordings.append((os.path.relpath(path, root), camera_id))
+    return sorted(recordings)
+
+def segments(root: str, recording: str, segment_sec: float) -> list:
+    try:
+        duration = float(ffmpeg.probe(os.path.join(root, recording))["format"]["duration"])
+    except (ffmpeg.Error, KeyError, ValueError) as e:
+        logging.warning(f"Could not probe {recording} ({e}), replaying it as one segment")
+        return [(0.0, None)]
+    count = max(math.ceil(duration / segment_sec), 1)
+    return [(i * segment_sec, segment_sec) for i in range(count)]
+
+def segment_key(recording: str, start_sec: float) -> str:
+    return f"{recording}@{start_sec:.3f}".rstrip("0").rstrip(".")
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+def load_checkpoint(out_dir: str) -> set:
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {json.loads(line)["segment"] for line in f if line.strip()}
+
+# A crash between writing a segment's rows and checkpointing it leaves rows that the
+# resumed run writes again; keep only rows of checkpointed segments
+def prune_results(out_dir: str, done: set):
+    path = os.path.join(out_dir, RESULTS_FILE)
+    if not os.path.exists(path):
+        return
+    dropped = 0
+    with open(path) as f, open(path + ".tmp", "w") as pruned:
+        for line in f:
+            if not line.strip():
+                continue
+            segment = json.loads(line).get("segment")
+            if segment is None or segment in done:
+                pruned.write(line)
+            else:
+                dropped += 1
+    os.replace(path + ".tmp", path)
+    if dropped:
+        logging.warning(f"Dropped {dropped} rows from unfinished segments")
+
+# Results from different thresholds must not be mixed in one output directory
+def check_params(out_dir: str, params: dict):
+    path = os.path.join(out_dir, PARAMS_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != params:
+            sys.exit(f"{out_dir} was written with {previous}, not {params}; use a new --out to change parameters")
+        return
+    with open(path, "w") as f:
+        json.dump(params, f, indent=2)
+
+async def analyze_frames(frames, camera_id: str, density_threshold: float) -> list:
+    results = []
+    for frame in frames:
+        estimate, labels = await asyncio.gather(
+            analyze_density(frame["frame"], camera_id),
+            detect_anomalies(frame["frame"], camera_id)
+        )
+        results.append({
+            "offset_sec": round(frame["offset_sec"], 3),
+            "motion": frame["motion"],
+            "edge_density": frame["density"],
+            "crowd_density": estimate["crowd_density"],
+            "confidence": estimate["confidence"],
+            "status": bottleneck_status(estimate["crowd_density"], density_threshold),
+            "labels": labels,
+            "threat": is_threat(labels)
+        })
+    return results
+
+# Runs in a worker process: one segment of a recording, frames streamed from ffmpeg
+def replay_segment(root: str, recording: str, camera_id: str, start_sec: float, duration_sec: float,
+                   fps: float, motion_threshold: float, density_threshold: float) -> dict:
+    start = time.perf_counter()
+    frames = iter_frames(os.path.join(root, recording), fps, motion_threshold, start_sec, duration_sec)
+    try:
+        results = asyncio.run(analyze_frames(frames, camera_id, density_threshold))
+    except ffmpeg.Error as e:
+        # ffmpeg.Error does not survive pickling back to the parent process
+        raise RuntimeError(f"ffmpeg failed on {recording} at {start_sec:g}s: {e}") from None
+    segment = segment_key(recording, start_sec)
+    for result in results:
+        result.update({"recording": recording, "camera_id": camera_id, "segment": segment})
+    return {"segment": segment, "frames": len(results), "results": results,
+            "seconds": time.perf_counter() - start}
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded footage through the Drishti analysis pipeline")
+    parser.add_argument("recordings", help="Directory of recordings, walked recursively")
+    parser.add_argument("--out", default="replay-output", help="Output directory for results and checkpoint")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: all cores)")
+    parser.add_argument("--fps", type=positive_float, default=TARGET_FPS, help="Frames per second to sample")
+    parser.add_argument("--motion-threshold", type=float, default=MOTION_THRESHOLD)
+    parser.add_argument("--density-threshold", type=float, default=BOTTLENECK_DENSITY)
+    parser.add_argument("--segment-sec", type=positive_float, default=SEGMENT_SEC, help="Seconds of footage per task")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    check_params(args.out, {"fps": args.fps, "motion_threshold": args.motion_threshold,
+                            "density_threshold": args.density_threshold, "segment_sec": args.segment_sec})
+    done = load_checkpoint(args.out)
+    prune_results(args.out, done)
+    pending = [(recording, camera_id, start_sec, duration_sec)
+               for recording, camera_id in find_recordings(args.recordings)
+               for start_sec, duration_sec in segments(args.recordings, recording, args.segment_sec)
+               if segment_key(recording, start_sec) not in done]
+    logging.info(f"{len(pending)} segments to replay ({len(done)} already done) with {args.workers} workers")
+
+    total_frames = 0
+    failed = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool, \
+            open(os.path.join(args.out, RESULTS_FILE), "a") as results_file, \
+            open(os.path.join(args.out, CHECKPOINT_FILE), "a") as checkpoint_file:
+        futures = {
+            pool.submit(replay_segment, args.recordings, recording, camera_id, start_sec, duration_sec,
+                        args.fps, args.motion_threshold, args.density_threshold): segment_key(recording, start_sec)
+            for recording, camera_id, start_sec, duration_sec in pending
+        }
+        for future in as_completed(futures):
+            segment = futures[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                logging.error(f"Replay failed for {segment}: {e}")
+                failed.append(segment)
+                continue
+            for result in outcome["results"]:
+                results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+            os.fsync(results_file.fileno())
+            # Checkpoint only after the segment's results are on disk
+            checkpoint_file.write(json.dumps({"segment": segment, "frames": outcome["frames"]}) + "\n")
+            checkpoint_file.flush()
+            total_frames += outcome["frames"]
+            elapsed = time.perf_counter() - start
+            logging.info(f"{segment}: {outcome['frames']} frames in {outcome['seconds']:.1f}s "
+                         f"(overall {total_frames / elapsed:.1f} frames/sec)")
+
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(pending) - len(failed)} of {len(pending)} segments, {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed else 0:.1f} frames/sec)")
+    if failed:
+        sys.exit(f"{len(failed)} segments failed, re-run with the same --out to retry: {', '.join(sorted(failed))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import threading
+import time
+
+# Adaptive sampling configs
+MIN_FPS = 0.2             # quiet cameras drop to one frame every 5 seconds
+BASE_FPS = 1.0
+MAX_FPS = 5.0             # zones with a developing incident
+FRAME_BUDGET_FPS = 20.0   # total frames/sec across all cameras
+DENSITY_ALERT = 5.0       # bottleneck crowd_density that starts raising the rate
+DENSITY_CRITICAL = 8.0    # density at which a zone gets MAX_FPS
+ANOMALY_HOLD_SEC = 60     # keep MAX_FPS this long after an anomaly
+DECAY_HALF_LIFE_SEC = 120 # elevated demand halves every 2 minutes without new signals
+RATE_CACHE_SEC = 1.0      # rates are recomputed at most this often unless feedback arrives
+ACTIVE_TTL_SEC = 300      # an upload counts against the budget for this long
+
+# Per-camera extraction rates driven by agent feedback for each zone. Each zone has a
+# demand in [0, 1]: 0 means quiet (MIN_FPS), 1 means incident (MAX_FPS); zones with no
+# feedback yet run at BASE_FPS. Only active cameras (running streams, recent uploads)
+# share the budget. When their rates exceed it, every camera keeps MIN_FPS and the
+# remainder is shared in proportion to what each asked for above it; if even MIN_FPS for
+# every camera is over budget, all rates are scaled down together.
+class SamplingController:
+    def __init__(self, camera_zones: dict, min_fps: float = MIN_FPS, base_fps: float = BASE_FPS,
+                 max_fps: float = MAX_FPS, budget_fps: float = FRAME_BUDGET_FPS):
+        self.camera_zones = dict(camera_zones)  # camera_id -> zone_id
+        self.min_fps, self.base_fps, self.max_fps = min_fps, base_fps, max_fps
+        self.budget_fps = budget_fps
+        self._configured = set(camera_zones)
+        self._active_until = {}  # camera_id -> timestamp, None while a stream runs
+        self._demand = {}        # zone_id -> (demand, updated_at)
+        self._anomaly_until = {} # zone_id -> timestamp
+        self._cached = None      # (computed_at, rates)
+        self._lock = threading.Lock()
+
+    # Count a camera against the budget: for ttl seconds (an upload) or until deactivate() (a stream)
+    def activate(self, camera_id: str, zone_id: str = None, ttl: float = ACTIVE_TTL_SEC, now: float = None):
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if zone_id or camera_id not in self.camera_zones:
+                self.camera_zones[camera_id] = zone_id
+            # An upload never cuts short the hold of a running stream
+            if camera_id not in self._active_until or self._active_until[camera_id] is not None:
+                self._active_until[camera_id] = None if ttl is None else now + ttl
+            self._cached = None
+
+    def deactivate(self, camera_id: str):
+        with self._lock:
+            self._active_until.pop(camera_id, None)
+            self._forget(camera_id)
+            self._cached = None
+
+    # Ad-hoc cameras from uploads are dropped once inactive, so they cannot accumulate
+    def _forget(self, camera_id: str):
+        if camera_id not in self._configured:
+            self.camera_zones.pop(camera_id, None)
+
+    def _active(self, now: float) -> dict:
+        for camera_id, until in list(self._active_until.items()):
+            if until is not None and until <= now:
+                del self._active_until[camera_id]
+                self._forget(camera_id)
+        return {camera_id: self.camera_zones.get(camera_id) for camera_id in self._active_until}
+
+    def _current_demand(self, zone_id: str, now: float) -> float:
+        if self._anomaly_until.get(zone_id, 0) > now:
+            return 1.0
+        demand, updated_at = self._demand.get(zone_id, (None, now))
+        if demand is None:
+            return None
+        return demand * 0.5 ** ((now - updated_at) / DECAY_HALF_LIFE_SEC)
+
+    # Feed back an agent result for a zone
+    def report(self, zone_id: str, density: float = None, anomaly: bool = False, now: float = None):
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self._cached = None
+            if anomaly:
+                self._anomaly_until[zone_id] = now + ANOMALY_HOLD_SEC
+            if density is not None:
+                demand = (density - DENSITY_ALERT) / (DENSITY_CRITICAL - DENSITY_ALERT)
+                demand = min(max(demand, 0.0), 1.0)
+                current = self._current_demand(zone_id, now) or 0.0
+                # Rise immediately, fall gradually through decay
+                self._demand[zone_id] = (max(demand, current), now)
+
+    def _wanted(self, zone_id: str, now: float) -> float:
+        demand = self._current_demand(zone_id, now)
+        if demand is None:
+            return self.base_fps
+        if demand <= 0.01:
+            return self.min_fps
+        return self.base_fps + demand * (self.max_fps - self.base_fps)
+
+    def _compute(self, now: float) -> dict:
+        with self._lock:
+            wanted = {camera_id: self._wanted(zone_id, now) for camera_id, zone_id in self._active(now).items()}
+        total = sum(wanted.values())
+        if total <= self.budget_fps:
+            return wanted
+        floor = self.min_fps * len(wanted)
+        if floor >= self.budget_fps:
+            # Too many cameras for MIN_FPS each: scale every rate down to fit the budget
+            return {camera_id: rate * self.budget_fps / total for camera_id, rate in wanted.items()}
+        # Over budget: everyone keeps MIN_FPS, the rest is shared in proportion to the extra asked for
+        extra = {camera_id: rate - self.min_fps for camera_id, rate in wanted.items()}
+        scale = (self.budget_fps - floor) / (sum(extra.values()) or 1.0)
+        return {camera_id: self.min_fps + extra[camera_id] * scale for camera_id in wanted}
+
+    # Rates for all cameras; without an explicit time the result is cached for RATE_CACHE_SEC,
+    # since every stream asks for its rate on every frame
+    def rates(self, now: float = None) -> dict:
+        if now is not None:
+            return self._compute(now)
+        cached = self._cached
+        if cached is None or time.monotonic() - cached[0] > RATE_CACHE_SEC:
+            cached = self._cached = (time.monotonic(), self._compute(time.time()))
+        return cached[1]
+
+    # Rate for an active camera; inactive cameras get 0
+    def rate_for(self, camera_id: str, now: float = None) -> float:
+        return self.rates(now).get(camera_id, 0.0)
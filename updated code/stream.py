@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+import ffmpeg
+import metrics
+from frames import READ_CHUNK_SIZE, split_jpegs
+
+# Live ingest configs
+STREAM_QUEUE_SIZE = 4          # decoded-but-unprocessed frames per camera; oldest dropped when full
+RECONNECT_MIN_DELAY = 1.0      # seconds, doubled after each failed attempt
+RECONNECT_MAX_DELAY = 30.0
+RATE_LEVELS = (0.2, 0.5, 1.0, 2.0, 5.0)  # ffmpeg runs at the adaptive rate rounded up to one of these
+LEVEL_DOWN_HOLD_SEC = 30.0     # a lower level must hold this long before ffmpeg restarts for it
+
+# Smallest level covering the rate, so Python thins at most a few frames per kept one
+def rate_level(rate: float) -> float:
+    return next((level for level in RATE_LEVELS if level >= rate - 1e-6), RATE_LEVELS[-1])
+
+def is_live_source(url: str) -> bool:
+    return "://" in url and not url.startswith("file://")
+
+# Build the ffmpeg command for a persistent MJPEG pipe sampled at the given rate
+def stream_command(url: str, fps: float, realtime: bool = False) -> list:
+    input_args = {}
+    if is_live_source(url):
+        input_args.update({"fflags": "nobuffer", "flags": "low_delay"})
+        if url.startswith("rtsp://"):
+            input_args["rtsp_transport"] = "tcp"
+    elif realtime:
+        input_args["re"] = None  # pace local files like a live camera
+    stream = ffmpeg.input(url, **input_args).filter('fps', fps=fps)
+    return stream.output('pipe:', format='image2pipe', vcodec='mjpeg').compile()
+
+# One long-running ffmpeg reader per camera. Frames go through a small bounded queue to
+# on_frame; when processing falls behind, the oldest frames are dropped so analysis always
+# works on the freshest picture instead of an ever-growing backlog.
+class CameraStream:
+    def __init__(self, camera_id: str, url: str, fps: float, on_frame, realtime: bool = False, rate=None):
+        self.camera_id = camera_id
+        self.url = url
+        self.max_fps = fps  # ffmpeg sampling ceiling
+        self.fps = fps      # rate ffmpeg is currently running at
+        self.realtime = realtime
+        self._rate = rate  # optional callable() -> current fps, at most max_fps
+        self._lower_since = None  # when the rate level first dropped below self.fps
+        self._on_frame = on_frame  # async callable(jpeg_bytes)
+        self._queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._tasks = []
+        self._process = None
+        self.state = "stopped"
+        self.frames = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.last_frame_at = None
+
+    def status(self) -> dict:
+        return {
+            "camera_id": self.camera_id,
+            "url": self.url,
+            "fps": self.fps,
+            "max_fps": self.max_fps,
+            "rate": self._rate() if self._rate else self.fps,
+            "state": self.state,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+            "queue_depth": self._queue.qsize(),
+            "last_frame_at": self.last_frame_at
+        }
+
+    def start(self):
+        if self._tasks:
+            return
+        self.state = "starting"
+        self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._consume())]
+
+    async def stop(self):
+        self.state = "stopped"
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._kill()
+
+    async def _kill(self):
+        if self._process and self._process.returncode is None:
+            self._process.kill()
+            await self._process.wait()
+        self._process = None
+
+    async def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                got_frames = await self._read_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Stream {self.camera_id} failed: {e}")
+                got_frames = False
+            finally:
+                await self._kill()
+            if got_frames is None:
+                continue  # rate level changed, reopen at the new rate straight away
+            if not is_live_source(self.url):
+                self.state = "finished"
+                logging.info(f"Stream {self.camera_id} reached end of {self.url}")
+                return
+            delay = RECONNECT_MIN_DELAY if got_frames else min(delay * 2, RECONNECT_MAX_DELAY)
+            self.state = "reconnecting"
+            self.reconnects += 1
+            logging.warning(f"Stream {self.camera_id} disconnected, reconnecting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    # Level ffmpeg should move to, or None to keep the current one. Rising levels apply at
+    # once; falling ones only after LEVEL_DOWN_HOLD_SEC, so a wobbling rate does not keep
+    # reconnecting the camera. Local files are never restarted, as that would rewind them.
+    def _level_change(self) -> float:
+        if not self._rate or not is_live_source(self.url):
+            return None
+        level = min(rate_level(self._rate()), self.max_fps)
+        if level > self.fps:
+            return level
+        if level == self.fps:
+            self._lower_since = None
+            return None
+        if self._lower_since is None:
+            self._lower_since = time.monotonic()
+        return level if time.monotonic() - self._lower_since >= LEVEL_DOWN_HOLD_SEC else None
+
+    # Returns whether any frame arrived, or None when ffmpeg must restart at a new rate level
+    async def _read_once(self) -> bool:
+        if self._rate and is_live_source(self.url):
+            self.fps = min(rate_level(self._rate()), self.max_fps)
+        self._lower_since = None
+        cmd = stream_command(self.url, self.fps, self.realtime)
+        self._process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        self.state = "streaming"
+        logging.info(f"Stream {self.camera_id} opened {self.url} at {self.fps} fps")
+        buffer = bytearray()
+        got_frames = False
+        since_kept = None  # media seconds since the last frame passed on
+        while True:
+            chunk = await self._process.stdout.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return got_frames
+            buffer.extend(chunk)
+            for jpeg in split_jpegs(buffer):
+                got_frames = True
+                level = self._level_change()
+                if level is not None:
+                    logging.info(f"Stream {self.camera_id} moving from {self.fps} to {level} fps")
+                    return None
+                # Thin the ffmpeg output down to the current adaptive rate
+                if self._rate and since_kept is not None:
+                    since_kept += 1.0 / self.fps
+                    if since_kept + 1e-6 < 1.0 / self._rate():
+                        continue
+                since_kept = 0.0
+                if self._queue.full():
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                    metrics.EVENTS.inc(outcome="stream_frame_dropped")
+                self._queue.put_nowait(jpeg)
+
+    async def _consume(self):
+        while True:
+            jpeg = await self._queue.get()
+            self.frames += 1
+            self.last_frame_at = time.time()
+            try:
+                await self._on_frame(jpeg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Stream {self.camera_id} frame handling failed: {e}")
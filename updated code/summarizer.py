@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import metrics
+
+# Summarization configs
+SUMMARY_LANGUAGES = ("en", "hi")
+PROMPT_FIELDS = ("message", "type", "status", "severity", "crowd_density", "location", "zone_id")
+DEFAULT_LANGUAGE = "en"
+SUMMARY_BACKEND = os.getenv("SUMMARY_BACKEND", "gemini")  # gemini | local
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+BATCH_SIZE = 16             # events per model request
+BATCH_WAIT_SEC = 0.2        # how long to wait for a batch to fill
+LATENCY_BUDGET_SEC = 3.0    # after this the caller gets the template summary
+CACHE_SIZE = 2048
+QUEUE_SIZE = 256            # events waiting for the backend; beyond this callers get the template at once
+STALE_SEC = 30.0            # queued events nobody waits for are still summarized this long, for the cache
+
+# Fast per-language templates, used by the local backend and as the fallback
+TEMPLATES = {
+    "en": "{severity} {what} at {location}{when}.",
+    "hi": "{location} पर{when} {what} ({severity})।",
+}
+WHEN = {"en": " on {}", "hi": " {} को"}
+SEVERITY_WORDS = {
+    "en": {"low": "Low", "medium": "Medium", "high": "High", "critical": "Critical", "unknown": "Unknown"},
+    "hi": {"low": "कम", "medium": "मध्यम", "high": "उच्च", "critical": "गंभीर", "unknown": "अज्ञात"},
+}
+
+# Density is rounded to 0.5 both in the cache signature and in anything rendered from it,
+# so a cached summary never quotes a different density than the event it is served for
+def normalized_density(event: dict):
+    density = event.get("crowd_density")
+    return round(density * 2) / 2 if isinstance(density, (int, float)) else None
+
+def _what(event: dict) -> str:
+    if event.get("message"):
+        return event["message"]
+    if normalized_density(event) is not None:
+        return f"{event.get('status', 'crowd')} (density {normalized_density(event):.1f})"
+    return event.get("type") or event.get("status") or "event"
+
+def template_summary(event: dict, language: str = DEFAULT_LANGUAGE) -> str:
+    language = language if language in TEMPLATES else DEFAULT_LANGUAGE
+    severity = str(event.get("severity", "unknown")).lower()
+    return TEMPLATES[language].format(
+        severity=SEVERITY_WORDS[language].get(severity, severity.title()),
+        what=_what(event),
+        location=event.get("location", "Unknown"),
+        when=WHEN[language].format(event["timestamp"]) if event.get("timestamp") else ""
+    )
+
+# Events that differ only in ids, urls and timestamps share a summary
+def event_signature(event: dict) -> str:
+    key = {
+        "what": event.get("message") or event.get("type") or event.get("status"),
+        "severity": event.get("severity"),
+        "location": event.get("location"),
+        "zone_id": event.get("zone_id"),
+        "density": normalized_density(event),
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+def prompt_event(event: dict) -> dict:
+    fields = {key: event[key] for key in PROMPT_FIELDS if event.get(key) is not None}
+    if "crowd_density" in fields:
+        fields["crowd_density"] = normalized_density(event)
+    return fields
+
+def check_result(result, languages: tuple) -> dict:
+    if not isinstance(result, dict) or not all(isinstance(result.get(language), str) for language in languages):
+        raise ValueError(f"Summary missing languages {languages}: {str(result)[:200]}")
+    return result
+
+class SummaryBackend(ABC):
+    # Return one {language: text} dict per event, from a single generation
+    @abstractmethod
+    def generate(self, events: list, languages: tuple) -> list:
+        ...
+
+# Deterministic backend for tests and offline runs
+class LocalBackend(SummaryBackend):
+    def generate(self, events: list, languages: tuple) -> list:
+        return [{language: template_summary({**event, "timestamp": None}, language) for language in languages}
+                for event in events]
+
+class GeminiBackend(SummaryBackend):
+    def __init__(self, model: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self._model = genai.GenerativeModel(model)
+
+    def generate(self, events: list, languages: tuple) -> list:
+        prompt = (
+            "You write one-sentence crowd-safety alerts for event staff. For each event in the JSON "
+            f"array below, write a summary in each of these languages: {', '.join(languages)}. "
+            "Do not include timestamps. Reply with only a JSON array with one object per event, "
+            f"in the same order, whose keys are the language codes.\n\n"
+            f"{json.dumps([prompt_event(e) for e in events])}"
+        )
+        response = self._model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+        results = json.loads(response.text)
+        if not isinstance(results, list) or len(results) != len(events):
+            raise ValueError(f"Expected {len(events)} summaries, got {response.text[:200]}")
+        return results
+
+def make_backend(name: str = SUMMARY_BACKEND) -> SummaryBackend:
+    if name == "local":
+        return LocalBackend()
+    try:
+        return GeminiBackend()
+    except ImportError:
+        logging.warning("google-generativeai not installed, using local summary backend")
+        return LocalBackend()
+
+# Batches concurrent summarize() calls into one backend request, caches results by event
+# signature and coalesces identical in-flight events. Callers wait at most the latency
+# budget; a late batch still lands in the cache for the next identical alert. The queue is
+# bounded and events nobody has waited on for STALE_SEC are dropped, so a slow or failing
+# backend does not build up a backlog.
+class Summarizer:
+    def __init__(self, backend: SummaryBackend, languages: tuple = SUMMARY_LANGUAGES, batch_size: int = BATCH_SIZE,
+                 batch_wait: float = BATCH_WAIT_SEC, latency_budget: float = LATENCY_BUDGET_SEC,
+                 cache_size: int = CACHE_SIZE, queue_size: int = QUEUE_SIZE, stale_sec: float = STALE_SEC):
+        self.backend = backend
+        self.languages = languages
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.latency_budget = latency_budget
+        self.cache_size = cache_size
+        self.stale_sec = stale_sec
+        self._cache = OrderedDict()  # signature -> {language: text}
+        self._pending = {}           # signature -> Future
+        self._waiters = {}           # signature -> callers currently waiting on it
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def _fallback(self, event: dict) -> dict:
+        metrics.EVENTS.inc(outcome="summary_fallback")
+        return {language: template_summary(event, language) for language in self.languages}
+
+    def summarize(self, event: dict) -> dict:
+        signature = event_signature(event)
+        with self._lock:
+            if signature in self._cache:
+                self._cache.move_to_end(signature)
+                metrics.EVENTS.inc(outcome="summary_cache_hit")
+                return self._cache[signature]
+            future = self._pending.get(signature)
+            if future is None:
+                try:
+                    future = Future()
+                    self._queue.put_nowait((signature, event, future, time.monotonic()))
+                except queue.Full:
+                    metrics.EVENTS.inc(outcome="summary_queue_full")
+                    return self._fallback(event)
+                self._pending[signature] = future
+            self._waiters[signature] = self._waiters.get(signature, 0) + 1
+        try:
+            return future.result(timeout=self.latency_budget)
+        except FutureTimeout:
+            logging.warning(f"Summary backend exceeded {self.latency_budget}s budget, using template")
+            return self._fallback(event)
+        except Exception as e:
+            logging.error(f"Summary backend failed: {e}")
+            return self._fallback(event)
+        finally:
+            with self._lock:
+                self._waiters[signature] -= 1
+                if not self._waiters[signature]:
+                    del self._waiters[signature]
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    # Drop entries nobody is waiting for any more and that are too old to be worth caching
+    def _live(self, batch: list) -> list:
+        now = time.monotonic()
+        live = []
+        with self._lock:
+            for signature, event, future, queued_at in batch:
+                if self._waiters.get(signature) or now - queued_at < self.stale_sec:
+                    live.append((signature, event, future))
+                    continue
+                self._pending.pop(signature, None)
+                future.cancel()
+                metrics.EVENTS.inc(outcome="summary_stale")
+        return live
+
+    def _flush_loop(self):
+        while True:
+            batch = self._live(self._next_batch())
+            if not batch:
+                continue
+            try:
+                with metrics.timed("summary_batch"):
+                    results = self.backend.generate([event for _, event, _ in batch], self.languages)
+            except Exception as e:
+                results = [e] * len(batch)
+            if not isinstance(results, list) or len(results) != len(batch):
+                results = [ValueError(f"Expected {len(batch)} summaries, got {str(results)[:200]}")] * len(batch)
+            with self._lock:
+                for (signature, _, future), result in zip(batch, results):
+                    self._pending.pop(signature, None)
+                    if not isinstance(result, Exception):
+                        try:
+                            result = check_result(result, self.languages)
+                        except ValueError as e:
+                            result = e
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                        continue
+                    self._cache[signature] = result
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                    future.set_result(result)
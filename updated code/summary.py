@@ -6,12 +6,15 @@ import json
 import logging
 import uuid
 from datetime import datetime
+import metrics
+from summarizer import Summarizer, make_backend, template_summary, DEFAULT_LANGUAGE
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
 # Initialize FastAPI
 app = FastAPI(title="Summary Agent")
+metrics.install_fastapi(app, "summary")
 
 # Google Cloud configs
 PROJECT_ID = "your-gcp-project-id"
@@ -34,30 +37,38 @@ class EventLog(BaseModel):
     timestamp: str
     details: str = ""
 
-# Placeholder for Gemini
-def summary_generator(event: dict) -> str:
-    # TODO: Integrate Google Gemini for NLP-based summarization
-    # Input: Event data; Output: Human-readable summary
-    return f"{event.get('severity', 'Unknown').title()} {event.get('message', 'event')} at {event.get('location', 'Unknown')} on {event.get('timestamp', 'Unknown')}."
+# Batched, cached summarization backend (Gemini, or SUMMARY_BACKEND=local for tests)
+summarizer = Summarizer(make_backend())
+
+# Summarize an event in every supported language from a single generation
+def summary_generator(event: dict) -> dict:
+    return summarizer.summarize(event)
 
 # Process event from Pub/Sub
 def callback(message):
-    event = json.loads(message.data.decode('utf-8'))
-    event_id = str(uuid.uuid4())
-    
-    # Generate summary
-    summary_text = summary_generator(event)
-    summary_data = {
-        "summary": summary_text,
-        "eventIds": [event.get("camera_id", "unknown")],
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "language": "en",
-        "source": "summary-agent"
-    }
-    
-    # Store in Firebase
-    db_ref.child(event_id).set(summary_data)
-    
+    trace = metrics.trace_from_attributes(message.attributes)
+    with metrics.in_flight("summary"):
+        event = json.loads(message.data.decode('utf-8'))
+        event_id = str(uuid.uuid4())
+
+        # Generate summary
+        language = event.get("language", DEFAULT_LANGUAGE)
+        with metrics.timed("summary", trace):
+            translations = summary_generator(event)
+        summary_data = {
+            "summary": translations.get(language) or translations.get(DEFAULT_LANGUAGE) or template_summary(event, language),
+            "translations": translations,
+            "eventIds": [event.get("camera_id", "unknown")],
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "language": language,
+            "source": "summary-agent",
+            "trace_id": trace[metrics.TRACE_ID_ATTR]
+        }
+
+        # Store in Firebase
+        with metrics.timed("db_write", trace):
+            db_ref.child(event_id).set(summary_data)
+
     message.ack()
 
 # Start Pub/Sub subscription